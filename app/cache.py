@@ -0,0 +1,150 @@
+"""Byte-bounded LRU cache of encoded dataset API responses, with ETags."""
+
+import functools
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import Callable
+
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+# Bodies smaller than this are not worth compressing
+_MIN_COMPRESS_BYTES = 1024
+
+# Headers recomputed on every reply rather than replayed from the cache
+_SKIP_HEADERS = {"content-length", "content-encoding", "etag", "last-modified", "vary"}
+
+
+class CachedBody:
+    """One encoded response body plus its precompressed variants."""
+
+    def __init__(self, response: Response):
+        self.body = bytes(response.body)
+        self.status_code = response.status_code
+        self.headers = {
+            k: v for k, v in response.headers.items() if k.lower() not in _SKIP_HEADERS
+        }
+        self.variants: dict[str, bytes] = {}
+        if len(self.body) >= _MIN_COMPRESS_BYTES:
+            self.variants["gzip"] = gzip.compress(self.body, compresslevel=6)
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(self.body)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.body) + sum(len(v) for v in self.variants.values())
+
+    def respond(self, request: Request, etag: str, mtime: float) -> Response:
+        accepted = {
+            token.split(";")[0].strip().lower()
+            for token in request.headers.get("accept-encoding", "").split(",")
+        }
+        headers = dict(self.headers)
+        headers["Vary"] = "Accept, Accept-Encoding"
+        if mtime:
+            headers["Last-Modified"] = formatdate(mtime, usegmt=True)
+        body = self.body
+        for coding in ("br", "gzip"):
+            if coding in self.variants and coding in accepted:
+                body = self.variants[coding]
+                headers["Content-Encoding"] = coding
+                etag = f"{etag}-{coding}"
+                break
+        headers["ETag"] = f'"{etag}"'
+        return Response(body, status_code=self.status_code, headers=headers)
+
+
+class ResponseCache:
+    """LRU of CachedBody keyed by ETag, evicting once over max_bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, CachedBody] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> CachedBody | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: CachedBody) -> None:
+        if entry.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old.nbytes
+            self._entries[key] = entry
+            self._size += entry.nbytes
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.nbytes
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        tag = tag.removeprefix("W/").strip('"')
+        for coding in ("-gzip", "-br"):
+            tag = tag.removesuffix(coding)
+        if tag == etag:
+            return True
+    return False
+
+
+def cached(
+    cache: ResponseCache,
+    version: Callable[[Request], tuple[str, float] | None],
+    variant: Callable[[Request], str] = lambda request: "",
+):
+    """Serve a GET route from `cache`, revalidated against `version`.
+
+    `version(request)` returns (version tag, mtime) from store metadata, or
+    None to bypass caching (e.g. unknown dataset). The ETag covers the
+    version, path, query string and `variant(request)` (content
+    negotiation), so a matching If-None-Match gets a 304 before the route
+    runs. The route must take a `request` argument and return a Response.
+    """
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            request: Request = kwargs["request"]
+            current = version(request)
+            if current is None:
+                return await handler(*args, **kwargs)
+            tag, mtime = current
+            query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+            key = f"{tag}|{request.url.path}|{query}|{variant(request)}"
+            etag = hashlib.sha1(key.encode()).hexdigest()[:24]
+
+            if _etag_matches(request.headers.get("if-none-match", ""), etag):
+                return Response(status_code=304, headers={"ETag": f'"{etag}"'})
+
+            entry = cache.get(etag)
+            if entry is None:
+                response = await handler(*args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                # Compression of large bodies stays off the event loop
+                entry = await run_in_threadpool(CachedBody, response)
+                cache.put(etag, entry)
+            return entry.respond(request, etag, mtime)
+
+        return wrapper
+
+    return decorator
@@ -7,3 +7,28 @@ ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "")
 _BASE_DIR = Path(__file__).parent.parent
 SUBMISSIONS_DIR = Path(os.environ.get("SUBMISSIONS_DIR", _BASE_DIR / "data" / "submissions"))
 LOGS_DIR = Path(os.environ.get("LOGS_DIR", _BASE_DIR / "data" / "logs"))
+
+# Dataset API
+# Serve records pages by reading only the covering Parquet row groups until
+# a dataset has been fully loaded (e.g. by an id lookup).
+DATASET_LAZY_PAGING = os.environ.get("DATASET_LAZY_PAGING", "true").lower() == "true"
+# Byte budget for the encoded-response cache (bodies plus gzip/br variants)
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# Datasets are re-scanned in the background: on inotify events when the
+# watchfiles package is available (DATASET_WATCH=auto), else by polling.
+DATASET_WATCH = os.environ.get("DATASET_WATCH", "auto").lower()
+DATASET_POLL_INTERVAL = float(os.environ.get("DATASET_POLL_INTERVAL", 5))
+# Keep an uncompressed Arrow IPC copy of each dataset next to its Parquet
+# file and memory-map it, so all workers on a host share page-cache pages.
+DATASET_MMAP = os.environ.get("DATASET_MMAP", "false").lower() == "true"
+# Combined size of datasets and indexes kept in memory per worker before
+# least-recently-used ones are evicted (0 = unbounded)
+DATASET_MEMORY_BUDGET_MB = int(os.environ.get("DATASET_MEMORY_BUDGET_MB", 0))
+# Datasets to load (with their id index) at startup: "all" or a comma-separated
+# list of names. /health returns 503 until they are loaded.
+DATASET_WARMUP = os.environ.get("DATASET_WARMUP", "").strip()
+DATASET_WARMUP_WORKERS = int(os.environ.get("DATASET_WARMUP_WORKERS", 4))
+# Shared multi-worker mode: the first worker to need a dataset version
+# materializes its Arrow copy and id index here (ideally a tmpfs such as
+# /dev/shm/opendata); every worker memory-maps them read-only.
+DATASET_SHARED_DIR = os.environ.get("DATASET_SHARED_DIR", "")
@@ -0,0 +1,942 @@
+import base64
+import fcntl
+import glob
+import json
+import operator
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from bisect import bisect_left, bisect_right
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterator, TypeVar
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+try:
+    import watchfiles
+except ImportError:  # installed with uvicorn[standard]; polling otherwise
+    watchfiles = None
+
+from app.config import (
+    DATASET_LAZY_PAGING,
+    DATASET_MEMORY_BUDGET_MB,
+    DATASET_MMAP,
+    DATASET_SHARED_DIR,
+)
+
+T = TypeVar("T")
+
+# Shared mode implies memory-mapped tables
+_MAPPED = DATASET_MMAP or bool(DATASET_SHARED_DIR)
+
+
+class DatasetStore:
+    """Manages Parquet datasets with background change detection.
+
+    Loaded datasets are kept as Arrow tables. Rows are only converted to
+    Python objects for the slice a caller actually returns. Loaded
+    datasets and their indexes are evicted least-recently-used first once
+    their combined size exceeds `memory_budget` bytes (0 = unbounded).
+    """
+
+    def __init__(self, data_dir: Path, memory_budget: int = DATASET_MEMORY_BUDGET_MB * 1024 * 1024):
+        self._dir = data_dir
+        self._meta: dict[str, dict] = {}
+        # Least recently used first
+        self._loaded: OrderedDict[str, _Loaded] = OrderedDict()
+        self._lru_lock = threading.Lock()
+        self.memory_budget = memory_budget
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._scan_lock = threading.Lock()
+        # In-flight loads, so concurrent callers share one read per dataset
+        self._loading: dict[tuple, Future] = {}
+        self._loading_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: threading.Thread | None = None
+
+    def scan(self) -> dict[str, dict]:
+        """Re-scan directory and publish a new metadata snapshot.
+
+        Only files whose version (mtime, size) changed are re-read. If the
+        previous version is loaded in memory, the new one is loaded and
+        validated here, before it goes live, and swapped in together with
+        its metadata. A file that cannot be read or fails validation leaves
+        the previous version serving.
+        """
+        with self._scan_lock:
+            current_files = {}
+            if self._dir.exists():
+                for f in sorted(self._dir.glob("*.parquet")):
+                    current_files[f.stem] = f
+
+            snapshot = {}
+            loaded = {}
+            for name, f in current_files.items():
+                existing = self._meta.get(name)
+                current = self._loaded.get(name)
+                try:
+                    st = os.stat(f)
+                    version = f"{st.st_mtime_ns:x}-{st.st_size:x}"
+                    if existing and existing["version"] == version:
+                        snapshot[name] = existing
+                    else:
+                        meta = _read_meta(name, f)
+                        if current is not None:
+                            # Warm the new version so readers never wait on it
+                            current = self._single_flight(
+                                ("table", name, version), lambda: _Loaded.read(meta)
+                            )
+                        snapshot[name] = meta
+                except Exception:
+                    # Unreadable or invalid; keep serving what we had
+                    if existing:
+                        snapshot[name] = existing
+                if current is not None and current.meta is snapshot.get(name):
+                    loaded[name] = current
+
+            if _MAPPED:
+                # Copies of deleted datasets would otherwise stay forever,
+                # in shared memory if the copies dir is a tmpfs
+                for name in self._meta.keys() - current_files.keys():
+                    _remove_copies(_copies_dir(self._dir), name)
+
+            # Loaded data first, so a reader seeing the new metadata also
+            # finds its table. Dropped versions are freed once in-flight
+            # requests release them.
+            with self._lru_lock:
+                self._loaded = OrderedDict(
+                    (name, loaded[name]) for name in self._loaded if name in loaded
+                )
+            self._meta = snapshot
+        return snapshot
+
+    def snapshot(self) -> dict[str, dict]:
+        """Current metadata for all datasets. Do not mutate."""
+        return self._meta
+
+    def get_meta(self, name: str) -> dict | None:
+        return self._meta.get(name)
+
+    # ---- Change detection ----
+
+    def start_watching(self, interval: float, use_inotify: bool = True) -> None:
+        """Keep the snapshot current from a background thread.
+
+        Uses inotify (via watchfiles) when available, otherwise polls with
+        scan() every `interval` seconds.
+        """
+        if self._watcher is not None:
+            return
+        if use_inotify and watchfiles is not None and self._dir.exists():
+            target = self._watch_inotify
+        else:
+            target = self._watch_poll
+        self._stop.clear()
+        self._watcher = threading.Thread(
+            target=target, args=(interval,), name="dataset-watcher", daemon=True
+        )
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
+            self._watcher = None
+
+    def _watch_poll(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.scan()
+            except Exception:
+                continue
+
+    def _watch_inotify(self, interval: float) -> None:
+        try:
+            for _ in watchfiles.watch(
+                self._dir,
+                watch_filter=lambda change, path: path.endswith(".parquet"),
+                stop_event=self._stop,
+            ):
+                self.scan()
+        except Exception:
+            # e.g. inotify watch limit reached; fall back to polling
+            if not self._stop.is_set():
+                self._watch_poll(interval)
+
+    def get_table(self, name: str) -> pa.Table | None:
+        """Whole dataset as an Arrow table, loading it on first use.
+
+        Blocking; async callers should run it in a worker thread. Callers
+        that arrive while a load is in progress wait for that load instead
+        of starting their own.
+        """
+        meta = self.get_meta(name)
+        if not meta:
+            return None
+        return self._get_loaded(meta).table
+
+    def _get_loaded(self, meta: dict) -> "_Loaded":
+        name = meta["name"]
+        with self._lru_lock:
+            loaded = self._loaded.get(name)
+            if loaded is not None and loaded.meta is meta:
+                self._loaded.move_to_end(name)
+                self._hits += 1
+                return loaded
+            self._misses += 1
+        loaded = self._single_flight(("table", name, meta["version"]), lambda: _Loaded.read(meta))
+        # Don't install a version the watcher has since replaced
+        if self._meta.get(name) is meta:
+            with self._lru_lock:
+                self._loaded[name] = loaded
+                self._loaded.move_to_end(name)
+            self._enforce_budget()
+        return loaded
+
+    def _enforce_budget(self) -> None:
+        """Evict least-recently-used datasets until under the budget.
+
+        The most recently used dataset is never evicted, even if it alone
+        exceeds the budget.
+        """
+        if not self.memory_budget:
+            return
+        with self._lru_lock:
+            total = sum(loaded.nbytes for loaded in self._loaded.values())
+            while total > self.memory_budget and len(self._loaded) > 1:
+                _, evicted = self._loaded.popitem(last=False)
+                total -= evicted.nbytes
+                self._evictions += 1
+
+    def stats(self) -> dict:
+        """Cache counters and the current size of loaded datasets."""
+        with self._lru_lock:
+            sizes = {name: loaded.nbytes for name, loaded in self._loaded.items()}
+            return {
+                "loaded": sizes,
+                "bytes": sum(sizes.values()),
+                "budget": self.memory_budget,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+    def _is_loaded(self, meta: dict) -> bool:
+        loaded = self._loaded.get(meta["name"])
+        return loaded is not None and loaded.meta is meta
+
+    def _single_flight(self, key: tuple, load: Callable[[], T]) -> T:
+        with self._loading_lock:
+            future = self._loading.get(key)
+            leader = future is None
+            if leader:
+                future = self._loading[key] = Future()
+        if not leader:
+            return future.result()
+        try:
+            result = load()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._loading_lock:
+                self._loading.pop(key, None)
+
+    def warmup(self, names: list[str], max_workers: int = 4) -> dict[str, str]:
+        """Load the named datasets in parallel. Returns {name: error} for failures."""
+        failed = {}
+
+        def load(name: str) -> None:
+            try:
+                if self.get_table(name) is None:
+                    failed[name] = "not found"
+            except Exception as e:
+                failed[name] = str(e)
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            list(pool.map(load, names))
+        return failed
+
+    def read_rows(
+        self,
+        name: str,
+        offset: int,
+        limit: int,
+        columns: list[str] | None = None,
+    ) -> pa.Table | None:
+        """Rows [offset, offset + limit), optionally projected to `columns`.
+
+        Sliced from the cached table when the dataset is loaded. Otherwise
+        only the row groups covering the range are read from disk, using
+        the row counts recorded in the Parquet footer, and only the
+        requested column chunks are decoded.
+        """
+        meta = self.get_meta(name)
+        if not meta:
+            return None
+        if self._is_loaded(meta) or _MAPPED or not DATASET_LAZY_PAGING:
+            return _project(self._get_loaded(meta).table.slice(offset, limit), columns)
+
+        pf = _parquet_file(meta)
+        starts = meta["row_group_starts"]
+        stop = min(offset + limit, meta["num_rows"])
+        if offset >= stop:
+            return _project(pf.schema_arrow.empty_table(), columns)
+        first = bisect_right(starts, offset) - 1
+        last = bisect_left(starts, stop) - 1
+        table = pf.read_row_groups(range(first, last + 1), columns=columns)
+        return table.slice(offset - starts[first], stop - offset)
+
+    def filter_positions(self, name: str, filters: dict[str, str]) -> np.ndarray | None:
+        """Sorted row positions where every column equals the given value.
+
+        Values are cast to the column type, as for `field__eq` in
+        parse_predicates, and looked up by their Arrow string form (so
+        `x=3.0` finds 3.0 in a double column). Each column's index is built
+        on first use and dropped together with the cached table.
+        """
+        meta = self.get_meta(name)
+        if not meta:
+            return None
+        keys = {
+            column: pc.cast(_cast_values(meta["schema"], column, [value]), pa.string())[0].as_py()
+            for column, value in filters.items()
+        }
+        loaded = self._get_loaded(meta)
+        indexes = loaded.column_index
+        matches = []
+        for column, value in keys.items():
+            if column not in indexes:
+                try:
+                    index = self._single_flight(
+                        ("column", name, meta["version"], column),
+                        lambda: _build_column_index(loaded.table.column(column)),
+                    )
+                except (pa.ArrowNotImplementedError, pa.ArrowInvalid):
+                    raise InvalidFilter(f"Cannot filter on field '{column}'")
+                loaded.add_column_index(column, index)
+                self._enforce_budget()
+            matches.append(indexes[column].get(value, _NO_ROWS))
+        matches.sort(key=len)
+        result = matches[0]
+        for positions in matches[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, positions, assume_unique=True)
+        return result
+
+    def match_positions(
+        self,
+        name: str,
+        predicates: dict[str, str],
+        start: int = 0,
+        limit: int | None = None,
+    ) -> np.ndarray | None:
+        """Sorted row positions matching `field__op=value` predicates.
+
+        Evaluated against the Parquet file rather than the cached table.
+        Row groups whose min/max statistics rule out the predicate are
+        skipped, and only the referenced columns of the rest are read.
+        With `start` and `limit`, only matches at or after row `start` are
+        returned, and reading stops once `limit` of them are found, so a
+        cursor page costs about one page of row groups.
+        """
+        meta = self.get_meta(name)
+        if not meta:
+            return None
+        expr, columns = parse_predicates(meta["schema"], predicates)
+        fragment = ds.ParquetFileFormat().make_fragment(meta["source"])
+        pf = _parquet_file(meta)
+        starts = meta["row_group_starts"]
+        ends = starts[1:] + [meta["num_rows"]]
+        matches = [_NO_ROWS]
+        found = 0
+        for rg in sorted(fragment.subset(filter=expr).row_groups, key=lambda rg: rg.id):
+            if ends[rg.id] <= start:
+                continue
+            table = pf.read_row_group(rg.id, columns=columns)
+            pos = np.arange(starts[rg.id], ends[rg.id], dtype=np.int64)
+            table = table.append_column("__pos", pa.array(pos)).filter(expr)
+            positions = table.column("__pos").to_numpy()
+            if start > starts[rg.id]:
+                positions = positions[positions >= start]
+            matches.append(positions)
+            found += len(positions)
+            if limit is not None and found >= limit:
+                break
+        result = np.concatenate(matches)
+        return result if limit is None else result[:limit]
+
+    def take_rows(
+        self,
+        name: str,
+        positions: np.ndarray,
+        columns: list[str] | None = None,
+    ) -> pa.Table | None:
+        """Rows at the given ascending positions, optionally projected.
+
+        Taken from the cached table when loaded, otherwise read from just
+        the row groups that contain them.
+        """
+        meta = self.get_meta(name)
+        if not meta:
+            return None
+        if self._is_loaded(meta) or _MAPPED or not DATASET_LAZY_PAGING:
+            return _project(self._get_loaded(meta).table, columns).take(positions)
+
+        pf = _parquet_file(meta)
+        starts = np.asarray(meta["row_group_starts"], dtype=np.int64)
+        groups = np.searchsorted(starts, positions, side="right") - 1
+        pieces = [_project(pf.schema_arrow.empty_table(), columns)]
+        for rg in np.unique(groups):
+            local = positions[groups == rg] - starts[rg]
+            pieces.append(pf.read_row_group(int(rg), columns=columns).take(local))
+        return pa.concat_tables(pieces)
+
+    def iter_batches(self, name: str, batch_size: int = 10_000) -> Iterator[pa.RecordBatch] | None:
+        """Stream the file as record batches without caching it."""
+        meta = self.get_meta(name)
+        if not meta:
+            return None
+        return _parquet_file(meta).iter_batches(batch_size=batch_size)
+
+    def get_record_by_id(
+        self,
+        name: str,
+        record_id: str,
+        columns: list[str] | None = None,
+    ) -> dict | None:
+        meta = self.get_meta(name)
+        if not meta:
+            return None
+        loaded = self._get_loaded(meta)
+        pos = loaded.id_index.get(record_id)
+        if pos is None:
+            return None
+        return _project(loaded.table.slice(pos, 1), columns).to_pylist()[0]
+
+    def get_records_by_ids(
+        self,
+        name: str,
+        record_ids: list[str],
+        columns: list[str] | None = None,
+    ) -> tuple[pa.Table, list[str]] | None:
+        """Rows for the given ids, in request order, plus the ids not found."""
+        meta = self.get_meta(name)
+        if not meta:
+            return None
+        loaded = self._get_loaded(meta)
+        positions = loaded.id_index.get_many(record_ids)
+        found = positions >= 0
+        missing = [rid for rid, ok in zip(record_ids, found) if not ok]
+        return _project(loaded.table, columns).take(positions[found]), missing
+
+    def aggregate(
+        self,
+        name: str,
+        group_by: list[str],
+        metrics: list[tuple[str, str | None]],
+    ) -> pa.Table | None:
+        """Grouped metrics over the whole dataset, from parse_aggregate().
+
+        One column per group key, then one per metric named `count` or
+        `<metric>_<field>`, sorted by the group keys. Results are not kept
+        here: they are sized by client input, and repeats are served from
+        the response cache, which is bounded.
+        """
+        meta = self.get_meta(name)
+        if not meta:
+            return None
+        table = self._get_loaded(meta).table
+        aggregations = []
+        arrow_names = []
+        names = []
+        for metric, field in metrics:
+            if metric == "count":
+                aggregations.append(([], "count_all"))
+                arrow_names.append("count_all")
+                names.append("count")
+            else:
+                func = _AGGREGATE_FUNCS[metric]
+                aggregations.append((field, func))
+                arrow_names.append(f"{field}_{func}")
+                names.append(f"{metric}_{field}")
+        columns = list(dict.fromkeys(group_by + [f for _, f in metrics if f]))
+        try:
+            grouped = (
+                table.select(columns)
+                .group_by(group_by, use_threads=False)
+                .aggregate(aggregations)
+            )
+        except (pa.ArrowNotImplementedError, pa.ArrowInvalid) as e:
+            raise InvalidAggregate(f"Cannot aggregate: {e}")
+        result = grouped.select(group_by + arrow_names).rename_columns(group_by + names)
+        if group_by:
+            result = result.sort_by([(k, "ascending") for k in group_by])
+        return result
+
+
+class _Loaded:
+    """One version of a dataset held in memory, with indexes built from it."""
+
+    def __init__(self, meta: dict, table: pa.Table, id_index: "SortedIdIndex | None" = None):
+        self.meta = meta
+        self.table = table
+        # column -> str(value) -> sorted row positions, built on demand
+        self.column_index: dict[str, dict[str, np.ndarray]] = {}
+        # Memory-mapped tables live in the shared page cache, not our heap
+        self._table_bytes = 0 if _MAPPED else table.get_total_buffer_size()
+        if id_index is None:
+            id_index = SortedIdIndex.build(table)
+            self._index_bytes = id_index.nbytes
+        else:
+            self._index_bytes = 0
+        self.id_index = id_index
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate heap bytes held by the table and its indexes."""
+        return self._table_bytes + self._index_bytes
+
+    def add_column_index(self, column: str, index: dict[str, np.ndarray]) -> None:
+        if column not in self.column_index:
+            self.column_index[column] = index
+            self._index_bytes += _index_nbytes(index)
+
+    @classmethod
+    def read(cls, meta: dict) -> "_Loaded":
+        """Read the whole file and check it against its footer metadata."""
+        id_index = None
+        if _MAPPED:
+            table_path = _shared_path(meta, ".arrow")
+            _materialize(table_path, lambda tmp: _write_arrow_copy(meta, tmp))
+            table = _map_table(table_path)
+            if DATASET_SHARED_DIR:
+                index_path = _shared_path(meta, ".ids.arrow")
+                _materialize(index_path, lambda tmp: _write_table(SortedIdIndex.build(table).to_table(), tmp))
+                id_index = SortedIdIndex.from_table(_map_table(index_path))
+            _remove_copies(table_path.parent, meta["name"], keep_version=meta["version"])
+        else:
+            table = _parquet_file(meta).read()
+        if table.num_rows != meta["num_rows"] or not table.schema.equals(meta["schema"]):
+            raise ValueError(f"{meta['file']} changed while it was being read")
+        return cls(meta, table, id_index)
+
+
+class SortedIdIndex:
+    """Compact id -> row position index: ids sorted, with their positions.
+
+    Two flat Arrow arrays, so it can be written to and memory-mapped from
+    shared storage. Lookups are a binary search. Ids are compared in their
+    Arrow string form; for duplicate ids the last row wins.
+    """
+
+    def __init__(self, ids: pa.Array, positions: pa.Array):
+        self.ids = ids
+        self.positions = positions
+
+    @classmethod
+    def build(cls, table: pa.Table) -> "SortedIdIndex":
+        if "id" not in table.column_names:
+            return cls(pa.array([], pa.string()), pa.array([], pa.int64()))
+        keyed = pa.table({
+            "id": pc.cast(table.column("id"), pa.string()),
+            "pos": pa.array(np.arange(table.num_rows, dtype=np.int64)),
+        })
+        keyed = keyed.filter(pc.is_valid(keyed.column("id")))
+        keyed = keyed.sort_by([("id", "ascending"), ("pos", "ascending")])
+        return cls(keyed.column("id").combine_chunks(), keyed.column("pos").combine_chunks())
+
+    @classmethod
+    def from_table(cls, table: pa.Table) -> "SortedIdIndex":
+        return cls(table.column("id").combine_chunks(), table.column("pos").combine_chunks())
+
+    def to_table(self) -> pa.Table:
+        return pa.table({"id": self.ids, "pos": self.positions})
+
+    @property
+    def nbytes(self) -> int:
+        return self.ids.nbytes + self.positions.nbytes
+
+    def get(self, key: str) -> int | None:
+        i = bisect_right(_PySequence(self.ids), key) - 1
+        if i < 0 or self.ids[i].as_py() != key:
+            return None
+        return self.positions[i].as_py()
+
+    def get_many(self, keys: list[str]) -> np.ndarray:
+        """Row positions for many ids at once, -1 where absent.
+
+        A vectorized binary search: every key advances one step per
+        iteration with Arrow/numpy array ops, so the cost is about log2(n)
+        passes over the keys and nothing proportional to the dataset.
+        """
+        n = len(self.ids)
+        if n == 0 or not keys:
+            return np.full(len(keys), -1, dtype=np.int64)
+        wanted = pa.array(keys, pa.string())
+        lo = np.zeros(len(keys), dtype=np.int64)
+        hi = np.full(len(keys), n, dtype=np.int64)
+        active = lo < hi
+        while active.any():
+            mid = (lo + hi) // 2
+            at_mid = self.ids.take(np.minimum(mid, n - 1))
+            le = pc.less_equal(at_mid, wanted).to_numpy(zero_copy_only=False)
+            lo = np.where(active & le, mid + 1, lo)
+            hi = np.where(active & ~le, mid, hi)
+            active = lo < hi
+        # lo is now bisect_right; the candidate is the entry just before it
+        candidate = np.maximum(lo - 1, 0)
+        hit = (lo > 0) & pc.equal(self.ids.take(candidate), wanted).to_numpy(zero_copy_only=False)
+        positions = self.positions.to_numpy(zero_copy_only=False)
+        return np.where(hit, positions[candidate], -1)
+
+
+class _PySequence:
+    """Sequence view of an Arrow array for bisect, converting on access."""
+
+    def __init__(self, array: pa.Array):
+        self._array = array
+
+    def __len__(self) -> int:
+        return len(self._array)
+
+    def __getitem__(self, i: int):
+        return self._array[i].as_py()
+
+
+# ---- Arrow copies for memory-mapped / shared mode ----
+
+def _shared_path(meta: dict, suffix: str) -> Path:
+    """Location of a derived file for this dataset version.
+
+    Next to the Parquet file by default, or in DATASET_SHARED_DIR (e.g. a
+    tmpfs such as /dev/shm) when workers share one materialized copy.
+    """
+    return _copies_dir(meta["file"].parent) / f".{meta['name']}.{meta['version']}{suffix}"
+
+
+def _copies_dir(data_dir: Path) -> Path:
+    return Path(DATASET_SHARED_DIR) if DATASET_SHARED_DIR else data_dir
+
+
+def _materialize(path: Path, write: Callable[[Path], None]) -> None:
+    """Create `path` once across all worker processes on the host.
+
+    The first process to take the lock writes it (via temp file and
+    rename); the rest wait on the lock, then find it already present and
+    just attach.
+    """
+    if path.exists():
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lock_path = path.with_name(f"{path.name}.lock")
+    with open(lock_path, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if path.exists():
+            return
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            write(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+            lock_path.unlink(missing_ok=True)
+
+
+def _write_arrow_copy(meta: dict, path: Path) -> None:
+    """Stream the Parquet file into an uncompressed Arrow IPC file."""
+    pf = _parquet_file(meta)
+    with pa.ipc.new_file(str(path), pf.schema_arrow) as writer:
+        for batch in pf.iter_batches():
+            writer.write_batch(batch)
+
+
+def _write_table(table: pa.Table, path: Path) -> None:
+    with pa.ipc.new_file(str(path), table.schema) as writer:
+        writer.write_table(table)
+
+
+def _map_table(path: Path) -> pa.Table:
+    """Zero-copy, read-only table over a memory-mapped Arrow IPC file."""
+    with pa.memory_map(str(path), "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def _parse_copy_name(filename: str) -> tuple[str, str] | None:
+    """(dataset name, version) of a derived file, or None if it isn't one.
+
+    Names may contain dots (`t.v2`), so the version is split off the
+    right; a prefix match would confuse `t` with `t.v2`.
+    """
+    for suffix in (".ids.arrow", ".arrow"):
+        if filename.startswith(".") and filename.endswith(suffix):
+            name, _, version = filename[1:-len(suffix)].rpartition(".")
+            if name and _VERSION.fullmatch(version):
+                return name, version
+    return None
+
+
+_VERSION = re.compile(r"[0-9a-f]+-[0-9a-f]+")
+
+
+def _remove_copies(directory: Path, name: str, keep_version: str | None = None) -> None:
+    """Delete a dataset's derived files, except those of `keep_version`.
+
+    Existing mappings stay valid, so workers still using them are
+    unaffected.
+    """
+    for path in directory.glob(f".{glob.escape(name)}.*.arrow"):
+        parsed = _parse_copy_name(path.name)
+        if parsed and parsed[0] == name and parsed[1] != keep_version:
+            path.unlink(missing_ok=True)
+
+
+def _project(table: pa.Table, columns: list[str] | None) -> pa.Table:
+    return table if columns is None else table.select(columns)
+
+
+def _parquet_file(meta: dict) -> pq.ParquetFile:
+    """Reader for exactly the file version described by `meta`.
+
+    Reads go through the handle opened at scan time, never the path: once
+    a publish renames a new file over it, the path names the new version
+    until the next scan, while the handle still reads the old inode.
+    """
+    return pq.ParquetFile(meta["source"], metadata=meta["footer"])
+
+
+def _read_meta(name: str, path: Path) -> dict:
+    source = pa.OSFile(str(path))
+    # Version from the opened inode, so it always matches `source`
+    st = os.fstat(source.fileno())
+    pf = pq.ParquetFile(source)
+    schema = pf.schema_arrow
+    footer = pf.metadata
+    starts = []
+    row = 0
+    for i in range(footer.num_row_groups):
+        starts.append(row)
+        row += footer.row_group(i).num_rows
+    return {
+        "name": name,
+        "file": path,
+        "source": source,
+        "mtime": st.st_mtime,
+        "size": st.st_size,
+        "version": f"{st.st_mtime_ns:x}-{st.st_size:x}",
+        "num_rows": footer.num_rows,
+        "columns": [
+            {"name": field.name, "type": str(field.type)}
+            for field in schema
+        ],
+        "schema": schema,
+        "footer": footer,
+        "row_group_starts": starts,
+    }
+
+
+def _index_nbytes(index: dict[str, np.ndarray]) -> int:
+    """Rough size of a column index dict: table, keys and position arrays."""
+    size = sys.getsizeof(index)
+    for key, positions in index.items():
+        size += sys.getsizeof(key) + positions.nbytes
+    return size
+
+
+_NO_ROWS = np.empty(0, dtype=np.int64)
+
+
+class InvalidFilter(ValueError):
+    """Filter or predicate cannot be applied to the dataset."""
+
+
+_PREDICATE_OPS = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+}
+
+
+def _cast_values(schema: pa.Schema, field: str, values: list[str]) -> pa.Array:
+    """Query-string values cast to the column's type."""
+    if schema.get_field_index(field) < 0:
+        raise InvalidFilter(f"Unknown field '{field}'")
+    try:
+        return pc.cast(pa.array(values, pa.string()), schema.field(field).type)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        raise InvalidFilter(f"Invalid value for field '{field}': {','.join(values)!r}")
+
+
+def parse_predicates(schema: pa.Schema, predicates: dict[str, str]) -> tuple[pc.Expression, list[str]]:
+    """Build a filter expression from `field__op=value` query parameters.
+
+    Supported operators are those in _PREDICATE_OPS plus `in`, which takes
+    a comma-separated list. A bare `field=value` means `field__eq=value`.
+    Values are cast to the column type. Returns the expression and the
+    columns it references.
+    """
+    expr = None
+    columns = []
+    for key, raw in predicates.items():
+        field, _, op = key.partition("__")
+        op = op or "eq"
+        if schema.get_field_index(field) < 0:
+            raise InvalidFilter(f"Unknown field '{field}'")
+        if op != "in" and op not in _PREDICATE_OPS:
+            raise InvalidFilter(f"Unknown operator '{op}' on field '{field}'")
+        values = _cast_values(schema, field, raw.split(",") if op == "in" else [raw])
+        if op == "in":
+            term = pc.field(field).isin(values)
+        else:
+            term = _PREDICATE_OPS[op](pc.field(field), values[0])
+        expr = term if expr is None else expr & term
+        if field not in columns:
+            columns.append(field)
+    return expr, columns
+
+
+class InvalidAggregate(ValueError):
+    """Group-by or metric cannot be computed on the dataset."""
+
+
+# Metric name -> Arrow hash aggregate function
+_AGGREGATE_FUNCS = {
+    "sum": "sum",
+    "min": "min",
+    "max": "max",
+    "distinct": "count_distinct",
+}
+
+
+def _groupable(type_: pa.DataType) -> bool:
+    return not pa.types.is_nested(type_)
+
+
+def _aggregatable(metric: str, type_: pa.DataType) -> bool:
+    if metric == "distinct":
+        return _groupable(type_) and not pa.types.is_null(type_)
+    numeric = pa.types.is_integer(type_) or pa.types.is_floating(type_) or pa.types.is_decimal(type_)
+    if metric == "sum":
+        return numeric
+    return numeric or pa.types.is_string(type_) or pa.types.is_large_string(type_) or pa.types.is_temporal(type_)
+
+
+def parse_aggregate(
+    schema: pa.Schema,
+    group_by: str,
+    metrics: str,
+) -> tuple[list[str], list[tuple[str, str | None]]]:
+    """Parse `group_by=state,party` and `metrics=count,sum:district,...`.
+
+    Returns the group keys and (metric, field) pairs for
+    DatasetStore.aggregate. Group keys must be scalar columns. `count`
+    takes no field; sum needs a numeric column, min/max a numeric, string
+    or temporal one, and distinct any scalar column. Output column names
+    (the keys, `count` and `<metric>_<field>`) must not collide.
+    """
+    keys = list(dict.fromkeys(k.strip() for k in group_by.split(",") if k.strip()))
+    for key in keys:
+        if schema.get_field_index(key) < 0:
+            raise InvalidAggregate(f"Unknown field '{key}'")
+        if not _groupable(schema.field(key).type):
+            raise InvalidAggregate(f"Cannot group by field '{key}'")
+
+    parsed = []
+    for item in metrics.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        metric, _, field = item.partition(":")
+        if metric == "count" and not field:
+            parsed.append(("count", None))
+            continue
+        if metric not in _AGGREGATE_FUNCS or not field:
+            raise InvalidAggregate(f"Unknown metric '{item}'")
+        if schema.get_field_index(field) < 0:
+            raise InvalidAggregate(f"Unknown field '{field}'")
+        if not _aggregatable(metric, schema.field(field).type):
+            raise InvalidAggregate(f"Cannot compute {metric} of field '{field}'")
+        parsed.append((metric, field))
+    if not parsed:
+        raise InvalidAggregate("No metrics requested")
+    parsed = list(dict.fromkeys(parsed))
+
+    names = set(keys)
+    for metric, field in parsed:
+        name = "count" if field is None else f"{metric}_{field}"
+        if name in names:
+            raise InvalidAggregate(f"Metric '{metric}' would overwrite the group column '{name}'")
+        names.add(name)
+    return keys, parsed
+
+
+def _build_column_index(column: pa.ChunkedArray) -> dict[str, np.ndarray]:
+    """Map str(value) -> ascending row positions. Nulls are not indexed."""
+    keyed = pa.table({
+        "key": pc.cast(column, pa.string()),
+        "pos": pa.array(np.arange(len(column), dtype=np.int64)),
+    })
+    # Single-threaded grouping keeps each list in input (row) order
+    grouped = keyed.group_by("key", use_threads=False).aggregate([("pos", "list")])
+    lists = grouped.column("pos_list").combine_chunks()
+    flat = lists.values.to_numpy()
+    offsets = lists.offsets.to_numpy()
+    return {
+        key: flat[offsets[i]:offsets[i + 1]]
+        for i, key in enumerate(grouped.column("key").to_pylist())
+        if key is not None
+    }
+
+
+# ---- Cursors ----
+
+class InvalidCursor(ValueError):
+    """Cursor could not be decoded or points outside the dataset."""
+
+
+class StaleCursor(InvalidCursor):
+    """Cursor was issued for a different version of the dataset file."""
+
+
+def encode_cursor(meta: dict, position: int) -> str | None:
+    """Opaque cursor for the row at `position`, or None past the end."""
+    if position >= meta["num_rows"]:
+        return None
+    starts = meta["row_group_starts"]
+    rg = bisect_right(starts, position) - 1
+    payload = json.dumps([meta["version"], rg, position - starts[rg]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(meta: dict, cursor: str) -> int:
+    """Absolute row position for a cursor issued by encode_cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        version, rg, row = json.loads(base64.urlsafe_b64decode(padded))
+        rg, row = int(rg), int(row)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Malformed cursor")
+    if version != meta["version"]:
+        raise StaleCursor("Dataset has changed since this cursor was issued")
+    starts = meta["row_group_starts"]
+    if not 0 <= rg < len(starts) or row < 0:
+        raise InvalidCursor("Cursor out of range")
+    position = starts[rg] + row
+    if position >= meta["num_rows"]:
+        raise InvalidCursor("Cursor out of range")
+    return position
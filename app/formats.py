@@ -0,0 +1,117 @@
+"""Encoders for streaming Arrow record batches out of the dataset API."""
+
+import base64
+import io
+from datetime import timedelta
+from decimal import Decimal
+from typing import Any, Iterable, Iterator
+
+import orjson
+import pyarrow as pa
+import pyarrow.csv as pacsv
+from fastapi.responses import JSONResponse
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "arrow": (ARROW_STREAM, "arrows"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def _json_default(value: Any) -> Any:
+    """Encode Parquet types orjson has no native form for.
+
+    Timestamps, dates and times are handled by orjson itself (ISO 8601).
+    """
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(value).decode()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_json_default)
+
+
+class DatasetJSONResponse(JSONResponse):
+    """JSON response encoded directly with orjson.
+
+    Return an instance from the route (rather than a dict) so FastAPI's
+    jsonable_encoder pass over every record is skipped.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def accepts_arrow(accept: str) -> bool:
+    """True if an Accept header asks for the Arrow IPC stream format."""
+    for part in accept.split(","):
+        media, _, params = part.partition(";")
+        if media.strip().lower() == ARROW_STREAM:
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+def to_arrow_stream(table: pa.Table) -> bytes:
+    """Encode a table as a single Arrow IPC stream payload."""
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def iter_ndjson(batches: Iterable[pa.RecordBatch]) -> Iterator[bytes]:
+    for batch in batches:
+        rows = batch.to_pylist()
+        if rows:
+            yield b"".join(dumps(row) + b"\n" for row in rows)
+
+
+def _csv_unsupported(type_: pa.DataType) -> bool:
+    if pa.types.is_dictionary(type_):
+        return _csv_unsupported(type_.value_type)
+    return (
+        pa.types.is_nested(type_)
+        or pa.types.is_binary(type_)
+        or pa.types.is_large_binary(type_)
+        or pa.types.is_fixed_size_binary(type_)
+    )
+
+
+def csv_unsupported_fields(schema: pa.Schema) -> list[str]:
+    """Columns CSV can't represent: nested values, or raw bytes."""
+    return [field.name for field in schema if _csv_unsupported(field.type)]
+
+
+def iter_csv(batches: Iterable[pa.RecordBatch]) -> Iterator[bytes]:
+    header = True
+    for batch in batches:
+        buf = io.BytesIO()
+        pacsv.write_csv(batch, buf, write_options=pacsv.WriteOptions(include_header=header))
+        header = False
+        yield buf.getvalue()
+
+
+def iter_arrow_stream(schema: pa.Schema, batches: Iterable[pa.RecordBatch]) -> Iterator[bytes]:
+    """Arrow IPC stream: schema message, one message per batch, end marker."""
+    buf = io.BytesIO()
+
+    def drain() -> bytes:
+        data = buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+        return data
+
+    with pa.ipc.new_stream(buf, schema) as writer:
+        yield drain()
+        for batch in batches:
+            writer.write_batch(batch)
+            yield drain()
+    yield drain()
@@ -1,15 +1,53 @@
-import os
+import asyncio
+import time
 from pathlib import Path
 from uuid import uuid4
 
-import pyarrow.parquet as pq
-from fastapi import FastAPI, Form, Request
-from fastapi.responses import JSONResponse
+import numpy as np
+
+from fastapi import Body, FastAPI, Form, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 
 from app.admin import router as admin_router
-from app.telemetry import TelemetryMiddleware, handle_beacon, log_form_submission, maintain_logs
+from app.cache import ResponseCache, cached
+from app.config import (
+    DATASET_POLL_INTERVAL,
+    DATASET_WARMUP,
+    DATASET_WARMUP_WORKERS,
+    DATASET_WATCH,
+    RESPONSE_CACHE_MAX_BYTES,
+)
+from app.datasets import (
+    DatasetStore,
+    InvalidAggregate,
+    InvalidCursor,
+    InvalidFilter,
+    StaleCursor,
+    decode_cursor,
+    encode_cursor,
+    parse_aggregate,
+)
+from app.formats import (
+    ARROW_STREAM,
+    EXPORT_FORMATS,
+    DatasetJSONResponse,
+    accepts_arrow,
+    csv_unsupported_fields,
+    iter_arrow_stream,
+    iter_csv,
+    iter_ndjson,
+    to_arrow_stream,
+)
+from app.telemetry import (
+    TelemetryMiddleware,
+    emit_event,
+    handle_beacon,
+    log_form_submission,
+    maintain_logs,
+)
 
 app = FastAPI(title="OpenData Exchange", docs_url=None, redoc_url=None)
 app.include_router(admin_router)
@@ -26,93 +64,63 @@ app.add_middleware(TelemetryMiddleware)
 
 # ---- Dataset store ----
 
-class DatasetStore:
-    """Manages Parquet datasets with mtime-based refresh."""
-
-    def __init__(self, data_dir: Path):
-        self._dir = data_dir
-        self._meta: dict[str, dict] = {}
-        self._data: dict[str, list[dict]] = {}
-        self._index: dict[str, dict[str, dict]] = {}
-
-    def scan(self) -> dict[str, dict]:
-        """Re-scan directory, reload metadata for changed files."""
-        current_files = {}
-        if self._dir.exists():
-            for f in sorted(self._dir.glob("*.parquet")):
-                current_files[f.stem] = f
-
-        # Remove datasets whose files are gone
-        for name in list(self._meta.keys()):
-            if name not in current_files:
-                self._meta.pop(name, None)
-                self._data.pop(name, None)
-                self._index.pop(name, None)
-
-        # Add/update metadata for each file
-        for name, f in current_files.items():
-            mtime = os.path.getmtime(f)
-            existing = self._meta.get(name)
-            if existing and existing["mtime"] == mtime:
-                continue
-            try:
-                pf = pq.ParquetFile(f)
-                schema = pf.schema_arrow
-                self._meta[name] = {
-                    "name": name,
-                    "file": f,
-                    "mtime": mtime,
-                    "num_rows": pf.metadata.num_rows,
-                    "columns": [
-                        {"name": field.name, "type": str(field.type)}
-                        for field in schema
-                    ],
-                }
-                # Invalidate cached data so it reloads on next access
-                self._data.pop(name, None)
-                self._index.pop(name, None)
-            except Exception:
-                continue
-        return self._meta
-
-    def get_meta(self, name: str) -> dict | None:
-        self.scan()
-        return self._meta.get(name)
-
-    def get_records(self, name: str) -> list[dict] | None:
-        meta = self.get_meta(name)
-        if not meta:
-            return None
-        if name not in self._data:
-            table = pq.read_table(meta["file"])
-            cols = table.column_names
-            rows = table.to_pydict()
-            self._data[name] = [
-                {col: rows[col][i] for col in cols}
-                for i in range(table.num_rows)
-            ]
-            self._index[name] = {}
-            for row in self._data[name]:
-                row_id = row.get("id")
-                if row_id is not None:
-                    self._index[name][str(row_id)] = row
-        return self._data[name]
-
-    def get_record_by_id(self, name: str, record_id: str) -> dict | None:
-        self.get_records(name)
-        idx = self._index.get(name)
-        if idx is None:
-            return None
-        return idx.get(record_id)
+datasets = DatasetStore(public_data_dir)
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_BYTES)
+
 
+def _catalog_version(request: Request) -> tuple[str, float]:
+    metas = datasets.snapshot().values()
+    tag = ",".join(f"{m['name']}:{m['version']}" for m in metas)
+    return tag, max((m["mtime"] for m in metas), default=0)
+
+
+def _dataset_version(request: Request) -> tuple[str, float] | None:
+    meta = datasets.get_meta(request.path_params["name"])
+    if not meta:
+        return None
+    return meta["version"], meta["mtime"]
 
-datasets = DatasetStore(public_data_dir)
+
+def _response_variant(request: Request) -> str:
+    return "arrow" if accepts_arrow(request.headers.get("accept", "")) else "json"
+
+
+# Set once configured datasets are preloaded; /health reports 503 until then
+_warm = asyncio.Event()
+
+
+async def _warmup() -> None:
+    if DATASET_WARMUP == "all":
+        names = list(datasets.snapshot())
+    else:
+        names = [n.strip() for n in DATASET_WARMUP.split(",") if n.strip()]
+    start = time.perf_counter()
+    try:
+        failed = await run_in_threadpool(datasets.warmup, names, DATASET_WARMUP_WORKERS)
+        emit_event("dataset_warmup", {
+            "datasets": names,
+            "failed": failed,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+        })
+    finally:
+        # A dataset that fails to warm is still served (loaded on demand)
+        _warm.set()
 
 
 @app.on_event("startup")
 async def _startup():
     datasets.scan()
+    datasets.start_watching(DATASET_POLL_INTERVAL, use_inotify=DATASET_WATCH != "poll")
     maintain_logs()  # Compress old logs, delete expired logs
+    if DATASET_WARMUP:
+        app.state.warmup_task = asyncio.create_task(_warmup())
+    else:
+        _warm.set()
+
+
+@app.on_event("shutdown")
+async def _shutdown():
+    datasets.stop_watching()
 
 
 # ---- Page routes ----
@@ -247,64 +255,271 @@ async def beacon(request: Request):
 # ---- Dataset API ----
 
 @app.get("/api/v1/datasets")
-async def list_datasets():
-    datasets.scan()
-    return [
+@cached(response_cache, _catalog_version)
+async def list_datasets(request: Request):
+    return DatasetJSONResponse([
         {
             "name": ds["name"],
             "num_rows": ds["num_rows"],
             "columns": ds["columns"],
         }
-        for ds in datasets._meta.values()
-    ]
+        for ds in datasets.snapshot().values()
+    ])
 
 
 @app.get("/api/v1/datasets/{name}")
-async def get_dataset(name: str):
+@cached(response_cache, _dataset_version, _response_variant)
+async def get_dataset(request: Request, name: str):
     meta = datasets.get_meta(name)
     if not meta:
         return JSONResponse({"error": "Dataset not found"}, status_code=404)
-    return {
+    if accepts_arrow(request.headers.get("accept", "")):
+        # Schema-only stream: the Arrow equivalent of the column list
+        return Response(
+            to_arrow_stream(meta["schema"].empty_table()),
+            media_type=ARROW_STREAM,
+            headers={"X-Total-Count": str(meta["num_rows"])},
+        )
+    return DatasetJSONResponse({
         "name": meta["name"],
         "num_rows": meta["num_rows"],
         "columns": meta["columns"],
-    }
+    })
+
+
+# Query parameters of the records endpoint that are not field filters
+_RECORDS_PARAMS = {"limit", "offset", "cursor", "fields"}
+
+
+def _parse_fields(meta: dict, fields: str | None) -> list[str] | None:
+    """Column list from a comma-separated `fields=` value (None = all)."""
+    if not fields:
+        return None
+    columns = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    known = {col["name"] for col in meta["columns"]}
+    for col in columns:
+        if col not in known:
+            raise ValueError(f"Unknown field '{col}'")
+    return columns or None
 
 
 @app.get("/api/v1/datasets/{name}/records")
-async def get_dataset_records(name: str, limit: int = 100, offset: int = 0):
-    records = datasets.get_records(name)
-    if records is None:
+@cached(response_cache, _dataset_version, _response_variant)
+async def get_dataset_records(
+    request: Request,
+    name: str,
+    limit: int = 100,
+    offset: int = 0,
+    cursor: str | None = None,
+    fields: str | None = None,
+):
+    meta = datasets.get_meta(name)
+    if not meta:
         return JSONResponse({"error": "Dataset not found"}, status_code=404)
+    try:
+        projection = _parse_fields(meta, fields)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    # Parameters that aren't columns (e.g. `_=` cache-busters) are ignored
+    columns = {col["name"] for col in meta["columns"]}
+    filters = {
+        k: v for k, v in request.query_params.items()
+        if k not in _RECORDS_PARAMS and k.partition("__")[0] in columns
+    }
 
     limit = max(1, min(limit, 1000))
     offset = max(0, offset)
-    total = len(records)
-    sliced = records[offset:offset + limit]
-
-    return {
+    position = None
+    if cursor:
+        try:
+            position = decode_cursor(meta, cursor)
+        except StaleCursor as e:
+            return JSONResponse({"error": str(e)}, status_code=409)
+        except InvalidCursor as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+
+    if filters and position is not None and any("__" in key for key in filters):
+        # Predicate cursor pages scan forward from the cursor and stop after
+        # one page (plus a row for the next cursor). Counting the total
+        # would mean reading every matching row group, so it's omitted.
+        try:
+            matches = await run_in_threadpool(
+                datasets.match_positions, name, filters, position, limit + 1
+            )
+        except InvalidFilter as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        total = offset = None
+        page = await run_in_threadpool(datasets.take_rows, name, matches[:limit], projection)
+        next_position = int(matches[limit]) if len(matches) > limit else meta["num_rows"]
+    elif filters:
+        try:
+            if any("__" in key for key in filters):
+                # Range predicates are pushed down to the Parquet reader
+                matches = await run_in_threadpool(datasets.match_positions, name, filters)
+            else:
+                matches = await run_in_threadpool(datasets.filter_positions, name, filters)
+        except InvalidFilter as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        total = len(matches)
+        if position is not None:
+            offset = int(np.searchsorted(matches, position))
+        page = await run_in_threadpool(
+            datasets.take_rows, name, matches[offset:offset + limit], projection
+        )
+        end = offset + page.num_rows
+        next_position = int(matches[end]) if end < total else meta["num_rows"]
+    else:
+        if position is not None:
+            offset = position
+        total = meta["num_rows"]
+        page = await run_in_threadpool(datasets.read_rows, name, offset, limit, projection)
+        next_position = offset + page.num_rows
+    next_cursor = encode_cursor(meta, next_position) if page.num_rows else None
+
+    if accepts_arrow(request.headers.get("accept", "")):
+        # Pagination moves to headers; the body is the sliced batch as-is
+        headers = {}
+        if total is not None:
+            headers["X-Total-Count"] = str(total)
+            headers["X-Offset"] = str(offset)
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        return Response(to_arrow_stream(page), media_type=ARROW_STREAM, headers=headers)
+
+    sliced = page.to_pylist()
+    return DatasetJSONResponse({
         "name": name,
         "total": total,
         "offset": offset,
         "limit": limit,
         "count": len(sliced),
         "records": sliced,
-    }
+        "next_cursor": next_cursor,
+    })
 
 
 @app.get("/api/v1/datasets/{name}/records/{record_id}")
-async def get_dataset_record(name: str, record_id: str):
-    record = datasets.get_record_by_id(name, record_id)
+@cached(response_cache, _dataset_version)
+async def get_dataset_record(request: Request, name: str, record_id: str, fields: str | None = None):
+    meta = datasets.get_meta(name)
+    if not meta:
+        return JSONResponse({"error": "Dataset not found"}, status_code=404)
+    try:
+        projection = _parse_fields(meta, fields)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    record = await run_in_threadpool(datasets.get_record_by_id, name, record_id, projection)
     if record is None:
-        meta = datasets.get_meta(name)
-        if not meta:
-            return JSONResponse({"error": "Dataset not found"}, status_code=404)
         return JSONResponse({"error": "Record not found"}, status_code=404)
-    return {"name": name, "record": record}
+    return DatasetJSONResponse({"name": name, "record": record})
+
+
+# Upper bound on ids per batchGet request
+_BATCH_GET_MAX_IDS = 5000
+
+
+@app.post("/api/v1/datasets/{name}/records:batchGet")
+async def batch_get_dataset_records(
+    name: str,
+    ids: list[str | int] = Body(..., embed=True),
+    fields: str | None = None,
+):
+    meta = datasets.get_meta(name)
+    if not meta:
+        return JSONResponse({"error": "Dataset not found"}, status_code=404)
+    if len(ids) > _BATCH_GET_MAX_IDS:
+        return JSONResponse(
+            {"error": f"At most {_BATCH_GET_MAX_IDS} ids per request"}, status_code=400
+        )
+    try:
+        projection = _parse_fields(meta, fields)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    record_ids = list(dict.fromkeys(str(i) for i in ids))
+    table, missing = await run_in_threadpool(
+        datasets.get_records_by_ids, name, record_ids, projection
+    )
+    records = table.to_pylist()
+    return DatasetJSONResponse({
+        "name": name,
+        "count": len(records),
+        "records": records,
+        "missing": missing,
+    })
+
+
+@app.get("/api/v1/datasets/{name}/aggregate")
+@cached(response_cache, _dataset_version)
+async def aggregate_dataset(
+    request: Request,
+    name: str,
+    group_by: str = "",
+    metrics: str = "count",
+):
+    meta = datasets.get_meta(name)
+    if not meta:
+        return JSONResponse({"error": "Dataset not found"}, status_code=404)
+    try:
+        keys, parsed = parse_aggregate(meta["schema"], group_by, metrics)
+        result = await run_in_threadpool(datasets.aggregate, name, keys, parsed)
+    except InvalidAggregate as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    groups = result.to_pylist()
+    return DatasetJSONResponse({
+        "name": name,
+        "group_by": keys,
+        "metrics": [m if f is None else f"{m}:{f}" for m, f in parsed],
+        "count": len(groups),
+        "groups": groups,
+    })
+
+
+@app.get("/api/v1/datasets/{name}/export")
+async def export_dataset(name: str, fmt: str = Query("ndjson", alias="format")):
+    meta = datasets.get_meta(name)
+    if not meta:
+        return JSONResponse({"error": "Dataset not found"}, status_code=404)
+    if fmt not in EXPORT_FORMATS:
+        return JSONResponse(
+            {"error": f"Unsupported format '{fmt}'", "formats": sorted(EXPORT_FORMATS)},
+            status_code=400,
+        )
+
+    if fmt == "csv":
+        # Checked up front: once streaming starts, errors truncate the body
+        unsupported = csv_unsupported_fields(meta["schema"])
+        if unsupported:
+            return JSONResponse(
+                {"error": f"CSV cannot represent fields: {', '.join(unsupported)}", "formats": sorted(EXPORT_FORMATS)},
+                status_code=400,
+            )
+
+    media_type, ext = EXPORT_FORMATS[fmt]
+    filename = f"{name}.{ext}"
+    if fmt == "parquet":
+        # Already in the requested encoding; send the published file as-is
+        return FileResponse(meta["file"], media_type=media_type, filename=filename)
+
+    batches = datasets.iter_batches(name)
+    if fmt == "ndjson":
+        body = iter_ndjson(batches)
+    elif fmt == "csv":
+        body = iter_csv(batches)
+    else:
+        body = iter_arrow_stream(meta["schema"], batches)
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 
 # ---- Health check ----
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy"}
+    if not _warm.is_set():
+        return JSONResponse({"status": "warming"}, status_code=503)
+    return {"status": "healthy", "datasets": datasets.stats()}
@@ -1,11 +1,20 @@
+import asyncio
+import contextlib
 from abc import ABC, abstractmethod
-from typing import Generator
+from typing import AsyncIterator, Generator
 
 import requests
 
+try:
+    import httpx
+except ImportError:  # optional; fetch_all falls back to the blocking session
+    httpx = None
+
 
 class BaseCrawler(ABC):
     proxy: str | None = None
+    # Upper bound on concurrent requests made by fetch_all()
+    max_concurrency: int = 8
 
     @property
     @abstractmethod
@@ -25,6 +34,65 @@ class BaseCrawler(ABC):
             }
         return self._session
 
+    def async_client(self, **kwargs) -> "httpx.AsyncClient":
+        """httpx async client with proxy and a pool sized to max_concurrency."""
+        limits = httpx.Limits(
+            max_connections=self.max_concurrency,
+            max_keepalive_connections=self.max_concurrency,
+        )
+        return httpx.AsyncClient(proxy=self.proxy, limits=limits, follow_redirects=True, **kwargs)
+
+    async def astream(
+        self,
+        client: "httpx.AsyncClient",
+        url: str,
+        semaphore: asyncio.Semaphore | None = None,
+        **kwargs,
+    ) -> AsyncIterator[bytes]:
+        """GET url and yield the body in chunks as they arrive.
+
+        Lets a crawler parse large responses incrementally instead of
+        holding them whole. The semaphore caps requests in flight, so
+        callers can queue many URLs without overrunning the connection
+        pool; its slot is held until the body is consumed.
+        """
+        async with semaphore or contextlib.nullcontext():
+            async with client.stream("GET", url, **kwargs) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes():
+                    yield chunk
+
+    async def afetch(
+        self,
+        client: "httpx.AsyncClient",
+        url: str,
+        semaphore: asyncio.Semaphore | None = None,
+        **kwargs,
+    ) -> bytes:
+        """GET url and return the whole body (see astream)."""
+        return b"".join([chunk async for chunk in self.astream(client, url, semaphore, **kwargs)])
+
+    def fetch_all(self, urls: list[str], timeout: float = 30) -> list[bytes]:
+        """Fetch independent URLs concurrently; bodies are returned in order.
+
+        Without httpx installed, the URLs are fetched one after the other
+        through the blocking session instead.
+        """
+        if httpx is None:
+            bodies = []
+            for url in urls:
+                response = self.session.get(url, timeout=timeout)
+                response.raise_for_status()
+                bodies.append(response.content)
+            return bodies
+
+        async def fetch() -> list[bytes]:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            async with self.async_client(timeout=timeout) as client:
+                return await asyncio.gather(*(self.afetch(client, url, semaphore) for url in urls))
+
+        return asyncio.run(fetch())
+
     @abstractmethod
     def crawl(self) -> Generator[dict, None, None]:
         """Yield dicts with an 'id' key."""
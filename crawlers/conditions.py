@@ -1,23 +1,78 @@
 from abc import ABC, abstractmethod
 
+import pyarrow as pa
+import pyarrow.compute as pc
+
 
 class DoneCondition(ABC):
+    """Validation run over a crawl, one batch of records at a time.
+
+    The runner calls reset(), then update() with each batch as it is
+    written, then finalize(). Conditions keep only running state, so a
+    crawl is validated in a single pass without holding it in memory.
+    """
+
     @abstractmethod
-    def check(self, records: list[dict]) -> tuple[bool, str]:
-        """Return (passed, message)."""
+    def reset(self) -> None:
+        """Clear state before a new crawl."""
+        ...
+
+    @abstractmethod
+    def update(self, batch: list[dict]) -> None:
+        """Account for the next batch of records."""
+        ...
+
+    @abstractmethod
+    def finalize(self) -> tuple[bool, str]:
+        """Return (passed, message) for everything seen since reset()."""
         ...
 
+    def check(self, records: list[dict]) -> tuple[bool, str]:
+        """Return (passed, message) for a complete list of records."""
+        self.reset()
+        self.update(records)
+        return self.finalize()
+
+    def check_table(self, table: pa.Table) -> tuple[bool, str]:
+        """Return (passed, message) for an already written dataset.
+
+        Conditions override this with column-wise pyarrow.compute kernels;
+        the default converts the table back to records.
+        """
+        return self.check(table.to_pylist())
+
+
+def _record_id(table: pa.Table, index: int):
+    if "id" not in table.column_names:
+        return "?"
+    return table["id"][index].as_py()
+
+
+def _first_true(mask) -> int:
+    """Index of the first true value in a boolean array, or -1."""
+    return pc.index(pc.fill_null(mask, False), True).as_py()
+
 
 class MinCount(DoneCondition):
     """Fail if fewer than n records."""
 
     def __init__(self, n: int):
         self.n = n
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+
+    def update(self, batch):
+        self.count += len(batch)
 
-    def check(self, records):
-        count = len(records)
-        ok = count >= self.n
-        return ok, f"MinCount({self.n}): got {count}"
+    def finalize(self):
+        ok = self.count >= self.n
+        return ok, f"MinCount({self.n}): got {self.count}"
+
+    def check_table(self, table):
+        count = table.num_rows
+        return count >= self.n, f"MinCount({self.n}): got {count}"
 
 
 class MaxCount(DoneCondition):
@@ -25,11 +80,21 @@ class MaxCount(DoneCondition):
 
     def __init__(self, n: int):
         self.n = n
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+
+    def update(self, batch):
+        self.count += len(batch)
 
-    def check(self, records):
-        count = len(records)
-        ok = count <= self.n
-        return ok, f"MaxCount({self.n}): got {count}"
+    def finalize(self):
+        ok = self.count <= self.n
+        return ok, f"MaxCount({self.n}): got {self.count}"
+
+    def check_table(self, table):
+        count = table.num_rows
+        return count <= self.n, f"MaxCount({self.n}): got {count}"
 
 
 class RequiredFields(DoneCondition):
@@ -37,12 +102,38 @@ class RequiredFields(DoneCondition):
 
     def __init__(self, fields: list[str]):
         self.fields = fields
+        self.reset()
+
+    def reset(self):
+        self.failure = None
 
-    def check(self, records):
-        for r in records:
+    def update(self, batch):
+        if self.failure:
+            return
+        for r in batch:
             for f in self.fields:
                 if f not in r or r[f] is None:
-                    return False, f"RequiredFields: record '{r.get('id', '?')}' missing '{f}'"
+                    self.failure = f"RequiredFields: record '{r.get('id', '?')}' missing '{f}'"
+                    return
+
+    def finalize(self):
+        if self.failure:
+            return False, self.failure
+        return True, f"RequiredFields({self.fields}): all present"
+
+    def check_table(self, table):
+        # Report the first record with a gap, like the row-wise check
+        first = None
+        for f in self.fields:
+            if f in table.column_names:
+                index = _first_true(pc.is_null(table[f]))
+            else:
+                index = 0 if table.num_rows else -1
+            if index >= 0 and (first is None or index < first[0]):
+                first = (index, f)
+        if first is not None:
+            index, f = first
+            return False, f"RequiredFields: record '{_record_id(table, index)}' missing '{f}'"
         return True, f"RequiredFields({self.fields}): all present"
 
 
@@ -51,15 +142,46 @@ class UniqueField(DoneCondition):
 
     def __init__(self, field: str):
         self.field = field
-
-    def check(self, records):
-        seen = set()
-        for r in records:
+        self.reset()
+
+    def reset(self):
+        self.seen = set()
+        self.count = 0
+        self.failure = None
+
+    def update(self, batch):
+        self.count += len(batch)
+        if self.failure:
+            return
+        seen = self.seen
+        for r in batch:
             val = r.get(self.field)
             if val in seen:
-                return False, f"UniqueField({self.field}): duplicate '{val}'"
+                self.failure = f"UniqueField({self.field}): duplicate '{val}'"
+                # Nothing else to learn; drop the set
+                self.seen = set()
+                return
             seen.add(val)
-        return True, f"UniqueField({self.field}): all unique ({len(records)} records)"
+
+    def finalize(self):
+        if self.failure:
+            return False, self.failure
+        return True, f"UniqueField({self.field}): all unique ({self.count} records)"
+
+    def check_table(self, table):
+        count = table.num_rows
+        if self.field not in table.column_names:
+            # Every record is None
+            if count > 1:
+                return False, f"UniqueField({self.field}): duplicate 'None'"
+            return True, f"UniqueField({self.field}): all unique ({count} records)"
+        column = table[self.field]
+        if pc.count_distinct(column, mode="all").as_py() < count:
+            counts = table.select([self.field]).group_by(self.field).aggregate([([], "count_all")])
+            duplicated = counts.filter(pc.greater(counts["count_all"], 1))
+            val = duplicated[self.field][0].as_py()
+            return False, f"UniqueField({self.field}): duplicate '{val}'"
+        return True, f"UniqueField({self.field}): all unique ({count} records)"
 
 
 class FieldCoverage(DoneCondition):
@@ -68,12 +190,30 @@ class FieldCoverage(DoneCondition):
     def __init__(self, field: str, threshold: float = 0.9):
         self.field = field
         self.threshold = threshold
+        self.reset()
 
-    def check(self, records):
-        if not records:
+    def reset(self):
+        self.count = 0
+        self.filled = 0
+
+    def update(self, batch):
+        self.count += len(batch)
+        self.filled += sum(1 for r in batch if r.get(self.field) is not None)
+
+    def finalize(self):
+        if not self.count:
+            return False, f"FieldCoverage({self.field}): no records"
+        ratio = self.filled / self.count
+        ok = ratio >= self.threshold
+        return ok, f"FieldCoverage({self.field}): {ratio:.1%} (threshold {self.threshold:.0%})"
+
+    def check_table(self, table):
+        if not table.num_rows:
             return False, f"FieldCoverage({self.field}): no records"
-        filled = sum(1 for r in records if r.get(self.field) is not None)
-        ratio = filled / len(records)
+        filled = 0
+        if self.field in table.column_names:
+            filled = table.num_rows - table[self.field].null_count
+        ratio = filled / table.num_rows
         ok = ratio >= self.threshold
         return ok, f"FieldCoverage({self.field}): {ratio:.1%} (threshold {self.threshold:.0%})"
 
@@ -83,10 +223,30 @@ class FieldCompleteness(DoneCondition):
 
     def __init__(self, field: str):
         self.field = field
+        self.reset()
+
+    def reset(self):
+        self.failure = None
 
-    def check(self, records):
-        for r in records:
+    def update(self, batch):
+        if self.failure:
+            return
+        for r in batch:
             val = r.get(self.field)
             if val is not None and isinstance(val, str) and not val.strip():
-                return False, f"FieldCompleteness({self.field}): record '{r.get('id', '?')}' has blank value"
+                self.failure = f"FieldCompleteness({self.field}): record '{r.get('id', '?')}' has blank value"
+                return
+
+    def finalize(self):
+        if self.failure:
+            return False, self.failure
+        return True, f"FieldCompleteness({self.field}): no blank values"
+
+    def check_table(self, table):
+        if self.field in table.column_names:
+            column = table[self.field]
+            if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+                index = _first_true(pc.equal(pc.utf8_trim_whitespace(column), ""))
+                if index >= 0:
+                    return False, f"FieldCompleteness({self.field}): record '{_record_id(table, index)}' has blank value"
         return True, f"FieldCompleteness({self.field}): no blank values"
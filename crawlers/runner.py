@@ -1,13 +1,23 @@
 """CLI runner for crawlers.
 
-Usage: python -m crawlers.runner <source> [--output-dir DIR] [--proxy URL]
+Usage: python -m crawlers.runner <source> [<source> ...] [--output-dir DIR] [--proxy URL]
+                                   [--batch-size N] [--row-group-size N]
+       python -m crawlers.runner --all [--jobs N] [--timeout SECONDS] ...
+
+With more than one source, each crawl runs in its own process, at most
+--jobs at a time, and a crash or timeout only fails that source.
 """
 
 import argparse
 import os
+import signal
 import sys
 import time
+from itertools import islice
+from multiprocessing import Process
+from multiprocessing.connection import wait
 from pathlib import Path
+from typing import Iterable, Iterator
 
 import pyarrow as pa
 import pyarrow.parquet as pq
@@ -28,53 +38,279 @@ def _resolve_proxy(args) -> str | None:
     return None
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Run a crawler and export to Parquet.")
-    parser.add_argument("source", choices=sorted(CRAWLERS.keys()), help="Crawler source name")
-    parser.add_argument("--output-dir", default="./data/public", help="Output directory")
-    parser.add_argument("--proxy", default=None, help="SOCKS proxy (e.g. socks5h://127.0.0.1:9050)")
-    args = parser.parse_args()
+def _batched(records: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    it = iter(records)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+def _is_numeric(type_: pa.DataType) -> bool:
+    return pa.types.is_integer(type_) or pa.types.is_floating(type_) or pa.types.is_decimal(type_)
+
+
+class SchemaMismatch(ValueError):
+    """A batch's values cannot be stored losslessly in the file's schema."""
+
+
+class ParquetBatchWriter:
+    """Append batches of record dicts to a Parquet file.
+
+    Converted batches are buffered until a full row group is ready, so
+    memory is bounded by row_group_size rows. The file's schema is inferred
+    from what has been buffered (int and float columns promote to float),
+    and opening the file is deferred (up to max_deferred_groups row
+    groups) while a field is None in every record so far, so it still gets
+    its real type once a value shows up.
+
+    Later batches are inferred on their own and then cast to that schema.
+    Values that don't survive the cast (e.g. 12.5 into an int column)
+    raise SchemaMismatch instead of being truncated. Fields that first
+    appear after the file is opened are dropped, as from_pylist does for
+    keys missing from the first record.
+    """
 
-    crawler = CRAWLERS[args.source]()
-    proxy = _resolve_proxy(args)
+    max_deferred_groups = 10
+
+    def __init__(self, path: Path, row_group_size: int):
+        self.path = path
+        self.row_group_size = row_group_size
+        self.num_rows = 0
+        self._schema: pa.Schema | None = None
+        self._writer: pq.ParquetWriter | None = None
+        self._pending: list[pa.Table] = []
+        self._pending_rows = 0
+
+    def write(self, records: list[dict]) -> None:
+        if self._schema is None:
+            names = dict.fromkeys(key for r in records for key in r)
+            table = pa.table({name: self._column(records, name) for name in names})
+        else:
+            table = pa.Table.from_arrays(
+                [self._column(records, f.name, f.type) for f in self._schema],
+                schema=self._schema,
+            )
+        self._pending.append(table)
+        self._pending_rows += len(records)
+        self.num_rows += len(records)
+        if self._pending_rows >= self.row_group_size:
+            self._flush()
+
+    def _column(self, records: list[dict], name: str, type_: pa.DataType | None = None) -> pa.Array:
+        first = self.num_rows
+        try:
+            array = pa.array([r.get(name) for r in records])
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            raise SchemaMismatch(
+                f"Field '{name}' has values of mixed types in records {first}-{first + len(records) - 1}: {e}"
+            ) from None
+        if type_ is None or array.type == type_:
+            return array
+        try:
+            # Only fill in all-None columns or widen between numbers; a
+            # string column never silently becomes a number (or vice versa)
+            if not (pa.types.is_null(array.type) or (_is_numeric(array.type) and _is_numeric(type_))):
+                raise pa.ArrowInvalid(f"{array.type} to {type_}")
+            return array.cast(type_, safe=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            raise SchemaMismatch(
+                f"Field '{name}' was written as {type_}, but records {first}-{first + len(records) - 1} "
+                f"have {array.type} values that don't convert losslessly; "
+                f"a larger --row-group-size infers the schema from more records"
+            ) from None
+
+    def _flush(self, final: bool = False) -> None:
+        if not self._pending:
+            return
+        try:
+            table = pa.concat_tables(self._pending, promote_options="permissive")
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            raise SchemaMismatch(f"Records {self.num_rows - self._pending_rows}-{self.num_rows - 1} "
+                                 f"have fields of conflicting types: {e}") from None
+        if (
+            self._writer is None
+            and not final
+            and any(pa.types.is_null(f.type) for f in table.schema)
+            and self._pending_rows < self.max_deferred_groups * self.row_group_size
+        ):
+            self._pending = [table]
+            return
+        self._pending = []
+        self._pending_rows = 0
+        if self._writer is None:
+            self._schema = table.schema
+            self._writer = pq.ParquetWriter(self.path, self._schema)
+        self._writer.write_table(table, row_group_size=self.row_group_size)
+
+    def close(self) -> None:
+        self._flush(final=True)
+        if self._writer is None:
+            # No records at all: still produce a valid (empty) file
+            pq.write_table(pa.table({}), self.path)
+        else:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+        elif self._writer is not None:
+            self._writer.close()
+
+
+def run_source(
+    source: str,
+    output_dir: Path,
+    proxy: str | None = None,
+    batch_size: int = 10_000,
+    row_group_size: int = 100_000,
+) -> None:
+    """Crawl one source, validate it and publish its Parquet file.
+
+    Exits with status 1 if a record has no id or a condition fails;
+    the previously published file is then left untouched.
+    """
+    crawler = CRAWLERS[source]()
     if proxy:
         crawler.proxy = proxy
         print(f"[{crawler.name}] Using proxy: {proxy}")
     print(f"[{crawler.name}] Starting crawl...")
     start = time.time()
 
-    records = list(crawler.crawl())
-    elapsed = time.time() - start
-    print(f"[{crawler.name}] Crawled {len(records)} records in {elapsed:.1f}s")
-
-    # Validate all records have 'id'
-    for i, r in enumerate(records):
-        if "id" not in r:
-            print(f"FATAL: Record at index {i} has no 'id' field")
-            sys.exit(1)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_path = output_dir / f"{crawler.name}.parquet"
+    # Written next to the output, then renamed into place once validated.
+    # The rename is atomic, so the API never sees a partial or failing file;
+    # the temp name doesn't end in .parquet, so the API ignores it meanwhile.
+    tmp_path = output_path.with_name(f".{output_path.name}.{os.getpid()}.tmp")
 
-    # Run done conditions
     conditions = crawler.done_conditions()
-    failures = []
     for cond in conditions:
-        passed, msg = cond.check(records)
-        status = "PASS" if passed else "FAIL"
-        print(f"  [{status}] {msg}")
-        if not passed:
-            failures.append(msg)
-
-    if failures:
-        print(f"\n{len(failures)} condition(s) failed. Export blocked.")
-        sys.exit(1)
+        cond.reset()
 
-    # Write Parquet
-    output_dir = Path(args.output_dir)
-    output_dir.mkdir(parents=True, exist_ok=True)
-    output_path = output_dir / f"{crawler.name}.parquet"
+    try:
+        try:
+            with ParquetBatchWriter(tmp_path, row_group_size) as writer:
+                for batch in _batched(crawler.crawl(), batch_size):
+                    # Validate all records have 'id'
+                    for i, r in enumerate(batch, start=writer.num_rows):
+                        if "id" not in r:
+                            print(f"[{crawler.name}] FATAL: Record at index {i} has no 'id' field")
+                            sys.exit(1)
+                    writer.write(batch)
+                    for cond in conditions:
+                        cond.update(batch)
+        except SchemaMismatch as e:
+            print(f"[{crawler.name}] FATAL: {e}")
+            sys.exit(1)
+        elapsed = time.time() - start
+        print(f"[{crawler.name}] Crawled {writer.num_rows} records in {elapsed:.1f}s")
+
+        # Report done conditions
+        failures = []
+        for cond in conditions:
+            passed, msg = cond.finalize()
+            status = "PASS" if passed else "FAIL"
+            print(f"[{crawler.name}]   [{status}] {msg}")
+            if not passed:
+                failures.append(msg)
+
+        if failures:
+            print(f"[{crawler.name}] {len(failures)} condition(s) failed. Export blocked.")
+            sys.exit(1)
+
+        os.replace(tmp_path, output_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    print(f"[{crawler.name}] Wrote {output_path} ({writer.num_rows} rows)")
+
+
+def _run_child(source: str, **kwargs) -> None:
+    # Turn terminate() into SystemExit so run_source removes its temp file
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(143))
+    sys.stdout.reconfigure(line_buffering=True)
+    run_source(source, **kwargs)
+
+
+def run_sources(sources: list[str], jobs: int, timeout: float | None, **kwargs) -> dict[str, str]:
+    """Run sources in separate processes, at most `jobs` at once.
 
-    table = pa.Table.from_pylist(records)
-    pq.write_table(table, output_path)
-    print(f"[{crawler.name}] Wrote {output_path} ({len(records)} rows)")
+    A source still running after `timeout` seconds is terminated. Returns
+    source -> "ok" or a description of how it failed.
+    """
+    pending = list(sources)
+    running: dict[str, tuple[Process, float]] = {}
+    results: dict[str, str] = {}
+    while pending or running:
+        while pending and len(running) < jobs:
+            source = pending.pop(0)
+            proc = Process(target=_run_child, args=(source,), kwargs=kwargs, name=f"crawl-{source}")
+            proc.start()
+            running[source] = (proc, time.monotonic())
+
+        wait_for = None
+        if timeout is not None:
+            now = time.monotonic()
+            wait_for = max(0.0, min(started + timeout - now for _, started in running.values()))
+        wait([proc.sentinel for proc, _ in running.values()], timeout=wait_for)
+
+        for source, (proc, started) in list(running.items()):
+            if not proc.is_alive():
+                proc.join()
+                results[source] = "ok" if proc.exitcode == 0 else f"failed (exit {proc.exitcode})"
+            elif timeout is not None and time.monotonic() - started >= timeout:
+                proc.terminate()
+                proc.join(5)
+                if proc.is_alive():
+                    proc.kill()
+                    proc.join()
+                results[source] = f"timed out after {timeout:g}s"
+                print(f"[{source}] Timed out after {timeout:g}s, terminated")
+            else:
+                continue
+            del running[source]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run crawlers and export to Parquet.")
+    parser.add_argument("sources", nargs="*", metavar="source",
+                        help=f"Crawler source name ({', '.join(sorted(CRAWLERS))})")
+    parser.add_argument("--all", action="store_true", help="Run every registered crawler")
+    parser.add_argument("--output-dir", default="./data/public", help="Output directory")
+    parser.add_argument("--proxy", default=None, help="SOCKS proxy (e.g. socks5h://127.0.0.1:9050)")
+    parser.add_argument("--batch-size", type=int, default=10_000, help="Records converted to Arrow at a time")
+    parser.add_argument("--row-group-size", type=int, default=100_000, help="Rows per Parquet row group")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Crawlers run at once")
+    parser.add_argument("--timeout", type=float, default=None, help="Seconds before a crawler is terminated")
+    args = parser.parse_args()
+
+    sources = sorted(CRAWLERS) if args.all else list(dict.fromkeys(args.sources))
+    if not sources:
+        parser.error("give at least one source, or --all")
+    for source in sources:
+        if source not in CRAWLERS:
+            parser.error(f"unknown source '{source}' (choose from {', '.join(sorted(CRAWLERS))})")
+    kwargs = {
+        "output_dir": Path(args.output_dir),
+        "proxy": _resolve_proxy(args),
+        "batch_size": args.batch_size,
+        "row_group_size": args.row_group_size,
+    }
+
+    if len(sources) == 1 and args.timeout is None:
+        run_source(sources[0], **kwargs)
+        return
+
+    results = run_sources(sources, max(1, args.jobs), args.timeout, **kwargs)
+    print()
+    for source in sources:
+        print(f"  [{'PASS' if results[source] == 'ok' else 'FAIL'}] {source}: {results[source]}")
+    failed = [s for s in sources if results[s] != "ok"]
+    if failed:
+        print(f"\n{len(failed)} of {len(sources)} source(s) failed.")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -1,3 +1,5 @@
+import json
+
 from crawlers.base import BaseCrawler
 from crawlers.conditions import (
     FieldCompleteness,
@@ -18,8 +20,10 @@ class CongressContactsCrawler(BaseCrawler):
         return "congress_contacts"
 
     def crawl(self):
-        legislators = self.session.get(LEGISLATORS_URL, timeout=30).json()
-        social_raw = self.session.get(SOCIAL_MEDIA_URL, timeout=30).json()
+        # Independent files; fetched concurrently
+        legislators, social_raw = (
+            json.loads(body) for body in self.fetch_all([LEGISLATORS_URL, SOCIAL_MEDIA_URL], timeout=30)
+        )
 
         # Index social media by bioguide ID
         social = {}
@@ -0,0 +1,57 @@
+"""Re-validate published Parquet files against their crawler's done conditions.
+
+Usage: python -m crawlers.validate <file.parquet> [...] [--source NAME]
+
+The crawler is looked up by file stem (e.g. congress_contacts.parquet),
+unless --source is given. Exits non-zero if any condition fails.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import pyarrow.parquet as pq
+
+from crawlers.runner import CRAWLERS
+
+
+def validate(path: Path, source: str) -> list[str]:
+    """Print each condition's result for path; return the failure messages."""
+    table = pq.read_table(path)
+    print(f"[{source}] {path} ({table.num_rows} rows)")
+    if "id" not in table.column_names:
+        print("  [FAIL] no 'id' column")
+        return ["no 'id' column"]
+    failures = []
+    for cond in CRAWLERS[source]().done_conditions():
+        passed, msg = cond.check_table(table)
+        status = "PASS" if passed else "FAIL"
+        print(f"  [{status}] {msg}")
+        if not passed:
+            failures.append(msg)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate published Parquet files.")
+    parser.add_argument("files", nargs="+", type=Path, help="Parquet files to check")
+    parser.add_argument("--source", choices=sorted(CRAWLERS.keys()), help="Crawler source name (default: file stem)")
+    args = parser.parse_args()
+
+    failed = 0
+    for path in args.files:
+        source = args.source or path.stem
+        if source not in CRAWLERS:
+            print(f"FATAL: no crawler named '{source}' for {path}")
+            failed += 1
+            continue
+        if validate(path, source):
+            failed += 1
+
+    if failed:
+        print(f"\n{failed} file(s) failed validation.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""BaseCrawler's concurrent fetch helpers against a local stub HTTP server."""
+
+import asyncio
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from crawlers.base import BaseCrawler, httpx
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """GET /<delay>/<body> answers after delay seconds; /missing is a 404;
+    /chunks/<n> sends n chunks with a pause between them."""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            parts = self.path.strip("/").split("/")
+            if parts[0] == "missing":
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            elif parts[0] == "chunks":
+                self.send_response(200)
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i in range(int(parts[1])):
+                    data = f"part{i};".encode()
+                    self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                    self.wfile.flush()
+                    time.sleep(0.05)
+                self.wfile.write(b"0\r\n\r\n")
+            else:
+                time.sleep(float(parts[0]))
+                body = parts[1].encode()
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+class _Crawler(BaseCrawler):
+    name = "stub"
+
+    def crawl(self):
+        yield from ()
+
+    def done_conditions(self):
+        return []
+
+
+@unittest.skipIf(httpx is None, "httpx not installed")
+class FetchAllTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        self.server.lock = threading.Lock()
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.crawler = _Crawler()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_bodies_in_request_order(self):
+        # Later URLs answer first; results still follow the input order
+        urls = [f"{self.base}/{0.3 - i * 0.1:.1f}/body{i}" for i in range(3)]
+        self.assertEqual(self.crawler.fetch_all(urls), [b"body0", b"body1", b"body2"])
+
+    def test_requests_run_concurrently(self):
+        start = time.monotonic()
+        self.crawler.fetch_all([f"{self.base}/0.5/a", f"{self.base}/0.5/b"])
+        self.assertLess(time.monotonic() - start, 0.9)
+        self.assertEqual(self.server.max_in_flight, 2)
+
+    def test_concurrency_capped(self):
+        self.crawler.max_concurrency = 2
+        bodies = self.crawler.fetch_all([f"{self.base}/0.2/r{i}" for i in range(6)])
+        self.assertEqual(bodies, [f"r{i}".encode() for i in range(6)])
+        self.assertEqual(self.server.max_in_flight, 2)
+
+    def test_http_error_raises(self):
+        with self.assertRaises(httpx.HTTPStatusError):
+            self.crawler.fetch_all([f"{self.base}/0/ok", f"{self.base}/missing"])
+
+    def test_astream_yields_chunks(self):
+        async def collect():
+            async with self.crawler.async_client() as client:
+                return [chunk async for chunk in self.crawler.astream(client, f"{self.base}/chunks/3")]
+
+        chunks = asyncio.run(collect())
+        self.assertEqual(b"".join(chunks), b"part0;part1;part2;")
+        self.assertGreater(len(chunks), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()